@@ -2,18 +2,107 @@
 
 import numpy as np
 import math
-from numba import njit
-from game_functions import move_up, move_down, move_left, move_right, check_game_over
+import threading
+from itertools import count
+from numba import njit, prange, types, from_dtype
+from game_functions import (
+    move_up, move_down, move_left, move_right,
+    execute_move_bitboard, board_to_bitboard, transpose_bitboard, empty_nibble_mask, check_game_over_bitboard,
+    ROW_COUNT, ROW_MASK,
+)
 
 CELL_COUNT = 4
 SEARCH_DEPTH = 5
 
 # Heuristic weights for evaluating board states
 SCORE_LOST_PENALTY = 20000.0
-SCORE_MONOTONICITY_WEIGHT = 4
+SCORE_MONOTONICITY_WEIGHT = 4.0
 SCORE_EMPTY_WEIGHT = 27.0
 SCORE_MERGES_WEIGHT = 70.0
 
+# Chance nodes reached with a lower probability than this are evaluated instead of searched
+CPROB_THRESHOLD = 0.0001
+
+# Moves in the order they are searched, indexed by the direction passed to execute_move_bitboard
+MOVES = (move_up, move_down, move_left, move_right)
+MOVE_COUNT = len(MOVES)
+
+# Transposition tables: one row of slots per root move, so the parallel subtrees never share a slot.
+# A slot holds a searched bitboard, the tag of the search and node type it belongs to, the depth
+# it was searched to and its score. Slots tagged by older searches are ignored, so the tables are
+# allocated once and never cleared. A slot is only reused by a node that needs no deeper search
+# than the one stored.
+TABLE_BITS = 16
+TABLE_SHIFT = np.uint64(64 - TABLE_BITS)
+HASH_MULTIPLIER = np.uint64(0x9E3779B97F4A7C15)  # Fibonacci hashing spreads similar bitboards apart
+TABLE_ENTRY = np.dtype(
+    [("board", np.uint64), ("tag", np.int64), ("depth", np.int64), ("score", np.float64)], align=True
+)
+TABLE_TYPE = types.Array(from_dtype(TABLE_ENTRY), 1, "A")
+TABLES_TYPE = types.Array(from_dtype(TABLE_ENTRY), 2, "A")
+TRANSPOSITION_TABLES = np.zeros((MOVE_COUNT, 1 << TABLE_BITS), dtype=TABLE_ENTRY)
+SEARCH_IDS = count(1)  # Ids of ai_move searches, 0 is never used so zeroed slots never match
+SEARCH_LOCK = threading.Lock()  # Searches share the tables, so only one thread may search at a time
+
+def build_heuristic_tables():
+    """
+    Precomputes the heuristic contributions of every possible bitboard row, so evaluating a board
+    becomes a handful of lookups over its rows and columns.
+
+    Returns:
+        tuple: Per-row empty cell count, possible merges, and the monotonicity totals of
+        tiles decreasing and increasing from left to right.
+    """
+    rows = np.arange(ROW_COUNT)
+    exponents = (rows[:, None] >> (4 * np.arange(CELL_COUNT))) & 0xF
+    values = np.where(exponents > 0, 1 << exponents, 0)
+    row_empty = (values == 0).sum(axis=1).astype(np.uint8)
+    row_merges = ((values[:, :-1] == values[:, 1:]) & (values[:, :-1] != 0)).sum(axis=1).astype(np.uint8)
+    differences = values[:, :-1] - values[:, 1:]
+    row_mono_left = np.maximum(differences, 0).sum(axis=1).astype(np.int32)
+    row_mono_right = np.maximum(-differences, 0).sum(axis=1).astype(np.int32)
+    return row_empty, row_merges, row_mono_left, row_mono_right
+
+ROW_EMPTY, ROW_MERGES, ROW_MONO_LEFT, ROW_MONO_RIGHT = build_heuristic_tables()
+
+@njit("float64(uint64)", cache=True, nogil=True, fastmath=True)
+def evaluate(bitboard):
+    """
+    Evaluates the board using the defined heuristics: empty cells, possible merges and monotonicity,
+    read from the row tables for every row and every column.
+
+    Args:
+        bitboard (np.uint64): The current game bitboard.
+
+    Returns:
+        float: The heuristic score of the board.
+    """
+    transposed = transpose_bitboard(bitboard)
+    empty = 0
+    merges = 0
+    # Every heuristic is a whole number, so only the weighted sum is done in floating point
+    rows_left = 0
+    rows_right = 0
+    cols_up = 0
+    cols_down = 0
+    for i in range(CELL_COUNT):
+        shift = np.uint64(16 * i)
+        row = (bitboard >> shift) & ROW_MASK
+        col = (transposed >> shift) & ROW_MASK
+        empty += ROW_EMPTY[row]
+        merges += ROW_MERGES[row] + ROW_MERGES[col]
+        rows_left += ROW_MONO_LEFT[row]
+        rows_right += ROW_MONO_RIGHT[row]
+        cols_up += ROW_MONO_LEFT[col]
+        cols_down += ROW_MONO_RIGHT[col]
+    monotonicity = min(rows_left, rows_right) + min(cols_up, cols_down)
+    return (
+        SCORE_EMPTY_WEIGHT * empty +
+        SCORE_MERGES_WEIGHT * merges -
+        SCORE_MONOTONICITY_WEIGHT * monotonicity
+    )
+
+@njit("float64(int32[:, :])", cache=True, nogil=True)
 def calculate_fullness(board):
     """
     Calculates the fullness of the board.
@@ -24,9 +113,12 @@ def calculate_fullness(board):
     Returns:
         float: Fullness percentage (0 to 1).
     """
-    filled_cells = np.sum(board != 0)
-    total_cells = board.size
-    return filled_cells / total_cells
+    filled_cells = 0
+    for row in range(CELL_COUNT):
+        for col in range(CELL_COUNT):
+            if board[row][col] != 0:
+                filled_cells += 1
+    return filled_cells / (CELL_COUNT * CELL_COUNT)
 
 def ai_move(board, default_depth=SEARCH_DEPTH):
     """
@@ -59,135 +151,188 @@ def ai_move(board, default_depth=SEARCH_DEPTH):
     # Optional: Print the current search depth for debugging
     # print(f"Board Fullness: {fullness*100:.2f}%, Search Depth: {current_depth}")
 
-    # Run the Expectimax algorithm with the determined depth
-    move_tuple, score = expectimax(board, depth=0, is_player=True, max_depth=current_depth)
-    if move_tuple is not None:
-        move_func, _ = move_tuple
-        new_board, move_made, score_increment = move_func(board.copy())
+    # Run the Expectimax algorithm on the bitboard with the determined depth
+    bitboard = board_to_bitboard(board)
+    with SEARCH_LOCK:
+        move_scores = search_root(bitboard, current_depth, TRANSPOSITION_TABLES, next(SEARCH_IDS))
+    direction = np.argmax(move_scores)
+    if move_scores[direction] > -math.inf:
+        new_board, move_made, score_increment = MOVES[direction](board)
         return new_board, move_made, score_increment
     else:
         return board, False, 0
 
-def expectimax(board, depth, is_player, max_depth):
+@njit(
+    types.float64(
+        types.uint64, types.int64, types.boolean, types.int64, types.float64, TABLE_TYPE, types.int64
+    ),
+    cache=True,
+    nogil=True,
+)
+def expectimax(board, depth, is_player, max_depth, cprob, table, search_id):
     """
-    Expectimax algorithm implementation.
+    Expectimax algorithm implementation. The tree is walked depth first over an explicit
+    stack holding one frame per depth, since Numba cannot cache recursive functions.
 
     Args:
-        board (np.ndarray): The current game board.
+        board (np.uint64): The current game bitboard.
         depth (int): Current depth in the search tree.
         is_player (bool): True if the current turn is the player's.
         max_depth (int): The maximum depth for the search.
+        cprob (float): Probability of the tile spawns leading to this node.
+        table (np.ndarray): Transposition table slots of the subtree being searched.
+        search_id (int): Id of the current search, telling its table slots from stale ones.
 
     Returns:
-        tuple: (best_move_tuple, best_score)
-    """
-    if depth >= max_depth or check_game_over(board):
-        return (None, evaluate(board)), evaluate(board)
-
-    if is_player:
-        best_score = -math.inf
-        best_move = None
-
-        # Explicitly try all four moves
-        for move_func in [move_up, move_down, move_left, move_right]:
-            new_board, move_made, score_increment = move_func(board.copy())
-            if not move_made:
-                continue
-            _, recursive_score = expectimax(new_board, depth + 1, False, max_depth)
-            total_score = score_increment + recursive_score
-            if total_score > best_score:
-                best_score = total_score
-                best_move = (move_func, score_increment)
-        return (best_move, best_score)
-    else:
-        # Chance node logic
-        empty_cells = list(zip(*np.where(board == 0)))
-        if not empty_cells:
-            return (None, evaluate(board)), evaluate(board)
-        total_score = 0
-        probability_per_cell = 1 / len(empty_cells)
-        for cell in empty_cells:
-            for value, prob in [(2, 0.9), (4, 0.1)]:
-                new_board = board.copy()
-                new_board[cell] = value
-                _, recursive_score = expectimax(new_board, depth + 1, True, max_depth)
-                total_score += prob * probability_per_cell * recursive_score
-        return (None, total_score), total_score
-
-@njit
-def evaluate(board):
-    """
-    Evaluates the board using the defined heuristics.
-
-    Args:
-        board (np.ndarray): The current game board.
-
-    Returns:
-        float: The heuristic score of the board.
+        float: The expected score of the board.
     """
-    return (
-        SCORE_EMPTY_WEIGHT * count_empty(board) +
-        SCORE_MERGES_WEIGHT * count_merges(board) -
-        SCORE_MONOTONICITY_WEIGHT * monotonicity(board)
-    )
+    frame_count = max(max_depth, depth) + 1
+    boards = np.empty(frame_count, dtype=np.uint64)
+    players = np.empty(frame_count, dtype=np.bool_)
+    cprobs = np.empty(frame_count, dtype=np.float64)
+    slots = np.empty(frame_count, dtype=np.uint64)
+    # Best score of a player node, running expectation of a chance node
+    scores = np.empty(frame_count, dtype=np.float64)
+    # Player: next direction to try. Chance: 1 while the 4 tile of the current cell is pending
+    cursors = np.empty(frame_count, dtype=np.int64)
+    # Chance nodes: empty cells not visited yet and the cell being filled
+    empty_masks = np.empty(frame_count, dtype=np.uint64)
+    cell_bits = np.empty(frame_count, dtype=np.uint64)
+    cell_cprobs = np.empty(frame_count, dtype=np.float64)
+    cell_weights = np.empty(frame_count, dtype=np.float64)
+    skip_fours = np.empty(frame_count, dtype=np.bool_)
+    # What the child being searched adds to the parent: the move score of a player node,
+    # the spawn probability of a chance node
+    child_weights = np.empty(frame_count, dtype=np.float64)
 
-@njit
-def count_empty(board):
-    """
-    Counts the number of empty cells on the board.
+    top = depth
+    boards[top] = board
+    players[top] = is_player
+    cprobs[top] = cprob
+    entering = True
+    returning = False
+    while True:
+        if entering:
+            entering = False
+            node = boards[top]
+            if top >= max_depth or check_game_over_bitboard(node):
+                value = evaluate(node)
+                returning = True
+            else:
+                # Reuse a previous search of this position if it went at least as deep
+                tag = 2 * search_id + players[top]
+                slots[top] = ((node ^ np.uint64(players[top])) * HASH_MULTIPLIER) >> TABLE_SHIFT
+                entry = table[slots[top]]
+                if entry.board == node and entry.tag == tag and entry.depth >= max_depth - top:
+                    value = entry.score
+                    returning = True
+                elif players[top]:
+                    scores[top] = -np.inf
+                    cursors[top] = 0
+                # Chance node logic, unlikely branches are not worth searching
+                elif cprobs[top] < CPROB_THRESHOLD:
+                    value = evaluate(node)
+                    returning = True
+                else:
+                    empty_mask = empty_nibble_mask(node)
+                    if not empty_mask:
+                        value = evaluate(node)
+                        returning = True
+                    else:
+                        empty_count = 0
+                        remaining = empty_mask
+                        while remaining:
+                            remaining &= remaining - np.uint64(1)
+                            empty_count += 1
+                        probability_per_cell = 1 / empty_count
+                        scores[top] = 0.0
+                        cursors[top] = 0
+                        empty_masks[top] = empty_mask
+                        cell_weights[top] = probability_per_cell
+                        cell_cprobs[top] = cprobs[top] * probability_per_cell
+                        # Skip the 4 tile when it is too unlikely and let the 2 tile stand for the whole cell
+                        skip_fours[top] = cell_cprobs[top] * 0.1 < CPROB_THRESHOLD
 
-    Args:
-        board (np.ndarray): The current game board.
+        if returning:
+            if top == depth:
+                return value
+            returning = False
+            top -= 1
+            if players[top]:
+                total_score = child_weights[top] + value
+                if total_score > scores[top]:
+                    scores[top] = total_score
+            else:
+                scores[top] += child_weights[top] * value
 
-    Returns:
-        int: Number of empty cells.
-    """
-    return np.sum(board == 0)
-
-@njit
-def count_merges(board):
-    """
-    Counts the number of possible merges on the board.
+        # Push the next child of the frame on top, or pop the frame once all are searched
+        node = boards[top]
+        child = node
+        child_cprob = cprobs[top]
+        if players[top]:
+            # Explicitly try all four moves
+            while cursors[top] < MOVE_COUNT:
+                new_board, score_increment = execute_move_bitboard(node, cursors[top])
+                cursors[top] += 1
+                if new_board != node:
+                    child = new_board
+                    child_weights[top] = score_increment
+                    break
+        elif cursors[top]:
+            cursors[top] = 0
+            child = node | (cell_bits[top] << np.uint64(1))
+            child_cprob = cell_cprobs[top] * 0.1
+            child_weights[top] = 0.1 * cell_weights[top]
+        elif empty_masks[top]:
+            # Visit the empty cells by peeling off the lowest set bit of the mask,
+            # which is also where a tile exponent is written into that nibble
+            remaining = empty_masks[top] & (empty_masks[top] - np.uint64(1))
+            cell_bits[top] = empty_masks[top] ^ remaining
+            empty_masks[top] = remaining
+            child = node | cell_bits[top]
+            if skip_fours[top]:
+                child_cprob = cell_cprobs[top]
+                child_weights[top] = 1.0 * cell_weights[top]
+            else:
+                cursors[top] = 1
+                child_cprob = cell_cprobs[top] * 0.9
+                child_weights[top] = 0.9 * cell_weights[top]
 
-    Args:
-        board (np.ndarray): The current game board.
+        if child != node:
+            boards[top + 1] = child
+            players[top + 1] = not players[top]
+            cprobs[top + 1] = child_cprob
+            top += 1
+            entering = True
+        else:
+            entry = table[slots[top]]
+            entry.board = node
+            entry.tag = 2 * search_id + players[top]
+            entry.depth = max_depth - top
+            entry.score = scores[top]
+            value = scores[top]
+            returning = True
 
-    Returns:
-        int: Number of possible merges.
-    """
-    merges = 0
-    for row in board:
-        for i in range(len(row) - 1):
-            if row[i] == row[i + 1] and row[i] != 0:
-                merges += 1
-    for col in board.T:
-        for i in range(len(col) - 1):
-            if col[i] == col[i + 1] and col[i] != 0:
-                merges += 1
-    return merges
-
-@njit
-def monotonicity(board):
+@njit(types.float64[:](types.uint64, types.int64, TABLES_TYPE, types.int64), parallel=True, cache=True, nogil=True)
+def search_root(board, max_depth, tables, search_id):
     """
-    Calculates the monotonicity of the board.
+    Scores every move from the root. The four moves are independent subtrees, so they are
+    searched in parallel, each with its own transposition table.
 
     Args:
-        board (np.ndarray): The current game board.
+        board (np.uint64): The current game bitboard.
+        max_depth (int): The maximum depth for the search.
+        tables (np.ndarray): Transposition table slots, one row per move.
+        search_id (int): Id of this search, unique across calls.
 
     Returns:
-        float: Monotonicity score.
+        np.ndarray: The score of each move in MOVES order, -inf where the move is not possible.
     """
-    totals = np.zeros(4)
-    for row in board:
-        for i in range(len(row) - 1):
-            if row[i] > row[i + 1]:
-                totals[0] += row[i] - row[i + 1]
-            elif row[i] < row[i + 1]:
-                totals[1] += row[i + 1] - row[i]
-    for col in board.T:
-        for i in range(len(col) - 1):
-            if col[i] > col[i + 1]:
-                totals[2] += col[i] - col[i + 1]
-            elif col[i] < col[i + 1]:
-                totals[3] += col[i + 1] - col[i]
-    return min(totals[0], totals[1]) + min(totals[2], totals[3])
\ No newline at end of file
+    move_scores = np.full(MOVE_COUNT, -np.inf)
+    for direction in prange(MOVE_COUNT):
+        new_board, score_increment = execute_move_bitboard(board, direction)
+        if new_board != board:
+            move_scores[direction] = score_increment + expectimax(
+                new_board, 1, False, max_depth, 1.0, tables[direction], search_id
+            )
+    return move_scores
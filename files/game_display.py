@@ -2,6 +2,8 @@
 # Game code inspired by @Kite
 
 # Import necessary modules
+import queue
+import threading
 from tkinter import Frame, Label, CENTER, Button
 import game_ai
 import game_functions
@@ -18,6 +20,9 @@ LEFT_KEY = "'a'"
 RIGHT_KEY = "'d'"
 AI_PLAY_KEY = "'1'"
 
+# Virtual event the AI thread raises when it has queued a move
+AI_MOVE_EVENT = "<<AIMove>>"
+
 # Fonts and colours
 LABEL_FONT = ("Verdana", 40, "bold")
 SCORE_FONT = ("Verdana", 20, "bold")
@@ -61,6 +66,12 @@ LABEL_COLOURS = {
     16384: "#f9f6f2",
 }
 
+# Text, background and text colour of every tile value, so redrawing a tile takes a single lookup
+TILE_STYLES = {0: ("", EMPTY_COLOUR, LABEL_COLOURS[2])}
+TILE_STYLES.update({
+    value: (str(value), TILE_COLOURS[value], LABEL_COLOURS[value]) for value in TILE_COLOURS
+})
+
 class Display(Frame):
     """
     Main class for the 2048 game interface using Tkinter.
@@ -72,6 +83,7 @@ class Display(Frame):
         self.grid()
         self.master.title('2048')
         self.master.bind("<Key>", self.key_press)  # Bind key press events
+        self.master.bind(AI_MOVE_EVENT, self.apply_ai_moves)  # Bind moves coming from the AI thread
 
         # Command mapping for key inputs
         self.commands = {
@@ -83,9 +95,12 @@ class Display(Frame):
 
         # Initialize game variables
         self.grid_cells = []  # List to store tile widgets
+        self.last_matrix = None  # Tile values currently shown, None until the first draw
         self.score = 0  # Current score
         self.highest_score = 0  # Highest score achieved
         self.ai_playing = False  # Flag to track AI playing status
+        self.ai_run_id = 0  # Changed on every AI start and stop, so a stale AI thread ends and its moves are dropped
+        self.ai_moves = queue.Queue()  # Moves computed by the AI thread, waiting to be drawn
         self.build_grid()  # Build the game grid layout
         self.init_matrix()  # Initialize the game matrix
         self.draw_grid_cells()  # Render the initial grid
@@ -120,6 +135,13 @@ class Display(Frame):
         )
         self.reset_button.place(x=EDGE_LENGTH + 230, y=40)
 
+        # Create an AI Play button
+        self.ai_play_button = Button(
+            self, text="AI Play (p)", font=SCORE_FONT, bg="green", fg="white",
+            command=self.toggle_ai_play  # Start or stop the AI when clicked
+        )
+        self.ai_play_button.place(x=10, y=40)
+
         # Create the game grid
         grid_frame = Frame(self, bg=GAME_COLOUR, width=EDGE_LENGTH, height=EDGE_LENGTH)
         grid_frame.grid(row=1, column=0)
@@ -152,17 +174,18 @@ class Display(Frame):
         """
         Updates the grid display based on the current game state.
         """
+        matrix = [[int(tile_value) for tile_value in row] for row in self.matrix]
         for row in range(CELL_COUNT):
             for col in range(CELL_COUNT):
-                tile_value = self.matrix[row][col]
-                if not tile_value:
-                    self.grid_cells[row][col].configure(text="", bg=EMPTY_COLOUR)
-                else:
-                    self.grid_cells[row][col].configure(
-                        text=str(tile_value),
-                        bg=TILE_COLOURS.get(tile_value, TILE_COLOURS[4096]),
-                        fg=LABEL_COLOURS.get(tile_value, LABEL_COLOURS[4096])
-                    )
+                tile_value = matrix[row][col]
+                # Only reconfigure tiles whose value changed since the last draw
+                if self.last_matrix is not None and self.last_matrix[row][col] == tile_value:
+                    continue
+                text, bg, fg = TILE_STYLES.get(
+                    tile_value, (str(tile_value), TILE_COLOURS[4096], LABEL_COLOURS[4096])
+                )
+                self.grid_cells[row][col].configure(text=text, bg=bg, fg=fg)
+        self.last_matrix = matrix
         self.update_idletasks()
 
     def key_press(self, event):
@@ -172,7 +195,7 @@ class Display(Frame):
         key = repr(event.char)
         if key == AI_PLAY_KEY:  # Toggle AI mode
             self.toggle_ai_play()
-        elif key in self.commands:  # Execute player move
+        elif key in self.commands and not self.ai_playing:  # Execute player move, unless the AI is in control
             self.commands[key]()
 
     def toggle_ai_play(self):
@@ -181,28 +204,54 @@ class Display(Frame):
         """
         if not self.ai_playing:
             self.ai_playing = True
-            self.run_ai_play()
+            self.ai_run_id += 1
+            # The AI thinks in a background thread so the window stays responsive during long searches.
+            # A thread from a stopped run may still be searching, game_ai makes this one wait for it.
+            threading.Thread(
+                target=self.ai_loop, args=(self.ai_run_id, self.matrix.copy()), daemon=True
+            ).start()
             self.ai_play_button.configure(text="Stop AI (p)")
         else:
-            self.ai_playing = False
-            self.ai_play_button.configure(text="AI Play (p)")
+            self.stop_ai_play()
 
-    def run_ai_play(self):
+    def stop_ai_play(self):
         """
-        Runs the AI's moves continuously until no more moves can be made or AI mode is disabled.
+        Stops the AI and discards any move it is still working on.
         """
-        if self.ai_playing:
-            self.ai_move_single()
-            self.master.after(100, self.run_ai_play)  # Schedule next AI move after 100ms
+        self.ai_playing = False
+        self.ai_run_id += 1
+        self.ai_play_button.configure(text="AI Play (p)")
 
-    def ai_move_single(self):
+    def ai_loop(self, run_id, matrix):
         """
-        Performs a single AI move and updates the grid.
+        Runs on the AI thread: plays moves on its own copy of the board as fast as they are found
+        and hands each result to the Tkinter thread, until no move is left or the AI is stopped.
         """
-        self.matrix, move_made, score_increment = game_ai.ai_move(self.matrix)
-        if move_made:
-            self.score += score_increment
-            self.matrix = game_functions.add_new_tile(self.matrix)
+        while run_id == self.ai_run_id:
+            matrix, move_made, score_increment = game_ai.ai_move(matrix)
+            if move_made:
+                matrix = game_functions.add_new_tile(matrix)
+            self.ai_moves.put((run_id, matrix, move_made, score_increment))
+            self.master.event_generate(AI_MOVE_EVENT, when="tail")
+            if not move_made:
+                break
+
+    def apply_ai_moves(self, event):
+        """
+        Applies the moves queued by the AI thread and redraws the grid once for all of them.
+        """
+        moved = False
+        while not self.ai_moves.empty():
+            run_id, matrix, move_made, score_increment = self.ai_moves.get()
+            if run_id != self.ai_run_id:
+                continue  # Left over from an AI run that was stopped
+            if move_made:
+                self.matrix = matrix
+                self.score += score_increment
+                moved = True
+            else:
+                self.stop_ai_play()  # No moves left
+        if moved:
             self.draw_grid_cells()
             self.update_score()
 
@@ -246,8 +295,7 @@ class Display(Frame):
         self.init_matrix()
         self.draw_grid_cells()
         self.update_score()
-        self.ai_playing = False
-        self.ai_play_button.configure(text="AI Play (p)")
+        self.stop_ai_play()
 
 
 gamegrid = Display()
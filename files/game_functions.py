@@ -6,9 +6,18 @@ from numba import njit
 
 CELL_COUNT = 4  # Number of tiles in a row/column
 NUMBER_OF_SQUARES = CELL_COUNT * CELL_COUNT  # Total number of tiles on the board
-NEW_TILE_DISTRIBUTION = np.array([2] * 9 + [4])  # 90% chance for 2, 10% for 4
+NEW_TILE_FOUR_PROBABILITY = 0.1  # 90% chance for 2, 10% for 4
 
-@njit
+# Bitboard layout: each tile is stored as log2(value) in a 4-bit nibble,
+# cell (row, col) lives at bit offset 4 * (row * CELL_COUNT + col)
+ROW_COUNT = 1 << 16  # Number of distinct 16-bit rows
+ROW_MASK = np.uint64(0xFFFF)
+NIBBLE_MASK = np.uint64(0xF)
+NIBBLE_LOW_BITS = np.uint64(0x1111111111111111)  # Lowest bit of every nibble
+HORIZONTAL_PAIR_BITS = np.uint64(0x0111011101110111)  # Lowest bit of every nibble with a right neighbour
+VERTICAL_PAIR_BITS = np.uint64(0x0000111111111111)  # Lowest bit of every nibble with a neighbour below
+
+@njit("int32[:, :]()", cache=True, nogil=True)
 def initialize_game():
     """
     Initializes the game board with two randomly placed tiles of value 2.
@@ -22,7 +31,7 @@ def initialize_game():
         board[row][col] = 2
     return board
 
-@njit
+@njit("int32[:, :](int32[:, :])", cache=True, nogil=True)
 def add_new_tile(board):
     """
     Adds a new tile (2 or 4) to a random empty cell on the board.
@@ -31,56 +40,83 @@ def add_new_tile(board):
     Returns:
         numpy.ndarray: The updated game board with the new tile.
     """
-    tile_value = np.random.choice(NEW_TILE_DISTRIBUTION)
-    empty_cells = list(zip(*np.where(board == 0)))
-    if not empty_cells:
+    empty_count = 0
+    for row in range(CELL_COUNT):
+        for col in range(CELL_COUNT):
+            if board[row][col] == 0:
+                empty_count += 1
+    if empty_count == 0:
         return board  # No empty cells, no new tile added
-    row, col = empty_cells[np.random.randint(len(empty_cells))]
-    board[row][col] = tile_value
+    tile_value = 4 if np.random.random() < NEW_TILE_FOUR_PROBABILITY else 2
+    # Walk to the randomly chosen empty cell
+    remaining = np.random.randint(empty_count)
+    for row in range(CELL_COUNT):
+        for col in range(CELL_COUNT):
+            if board[row][col] == 0:
+                if remaining == 0:
+                    board[row][col] = tile_value
+                    return board
+                remaining -= 1
     return board
 
-@njit
-def push_board_right(board):
+@njit("Tuple((boolean, int64))(int32[:], int32[:])", cache=True, nogil=True)
+def slide_merge_row_right(row_in, row_out):
     """
-    Slides all tiles to the right without merging.
+    Slides the tiles of a row to the right and merges equal neighbours in a single pass.
+    Other directions pass reversed or column views of the board as the row.
     Parameters:
-        board (numpy.ndarray): The current game board.
+        row_in (numpy.ndarray): The row to move.
+        row_out (numpy.ndarray): The row receiving the result, every cell is overwritten.
     Returns:
-        tuple: The updated board and a boolean indicating if any tiles moved.
+        tuple: A boolean indicating if any tile moved or merged, and the score increment.
     """
-    new = np.zeros_like(board)
+    score = 0
+    target = CELL_COUNT - 1
+    pending = 0  # Last tile seen, still waiting for a possible merge
+    for col in range(CELL_COUNT - 1, -1, -1):
+        value = row_in[col]
+        if value == 0:
+            continue
+        if value == pending:
+            row_out[target] = value * 2
+            score += value * 2
+            target -= 1
+            pending = 0
+        else:
+            if pending != 0:
+                row_out[target] = pending
+                target -= 1
+            pending = value
+    if pending != 0:
+        row_out[target] = pending
+        target -= 1
+    for col in range(target, -1, -1):
+        row_out[col] = 0
     done = False
-    for row in range(CELL_COUNT):
-        count = CELL_COUNT - 1
-        for col in range(CELL_COUNT - 1, -1, -1):
-            if board[row][col] != 0:
-                new[row][count] = board[row][col]
-                if col != count:
-                    done = True
-                count -= 1
-    return new, done
+    for col in range(CELL_COUNT):
+        if row_out[col] != row_in[col]:
+            done = True
+    return done, score
 
-@njit
-def merge_elements(board):
+@njit("Tuple((int32[:, :], boolean, int64))(int32[:, :])", cache=True, nogil=True)
+def move_right(board):
     """
-    Merges adjacent tiles of the same value and doubles their value.
+    Moves all tiles right and merges adjacent tiles if possible.
     Parameters:
         board (numpy.ndarray): The current game board.
     Returns:
-        tuple: The updated board, a boolean indicating if any tiles merged, and the score increment.
+        tuple: The updated board, a boolean indicating if any move was made, and the score increment.
     """
+    new = np.empty_like(board)
+    move_made = False
     score = 0
-    done = False
     for row in range(CELL_COUNT):
-        for col in range(CELL_COUNT - 1, 0, -1):
-            if board[row][col] == board[row][col - 1] and board[row][col] != 0:
-                board[row][col] *= 2
-                score += board[row][col]
-                board[row][col - 1] = 0
-                done = True
-    return board, done, score
-
-@njit
+        row_moved, row_score = slide_merge_row_right(board[row], new[row])
+        move_made = move_made or row_moved
+        score += row_score
+    return new, move_made, score
+
+@njit("Tuple((int32[:, :], boolean, int64))(int32[:, :])", cache=True, nogil=True)
 def move_up(board):
     """
     Moves all tiles up and merges adjacent tiles if possible.
@@ -89,15 +125,17 @@ def move_up(board):
     Returns:
         tuple: The updated board, a boolean indicating if any move was made, and the score increment.
     """
-    rotated_board = np.rot90(board, -1)
-    pushed_board, has_pushed = push_board_right(rotated_board)
-    merged_board, has_merged, score = merge_elements(pushed_board)
-    second_pushed_board, _ = push_board_right(merged_board)
-    rotated_back_board = np.rot90(second_pushed_board)
-    move_made = has_pushed or has_merged
-    return rotated_back_board, move_made, score
+    new = np.empty_like(board)
+    move_made = False
+    score = 0
+    # Columns read bottom to top turn an up move into a right move
+    for col in range(CELL_COUNT):
+        line_moved, line_score = slide_merge_row_right(board[::-1, col], new[::-1, col])
+        move_made = move_made or line_moved
+        score += line_score
+    return new, move_made, score
 
-@njit
+@njit("Tuple((int32[:, :], boolean, int64))(int32[:, :])", cache=True, nogil=True)
 def move_down(board):
     """
     Moves all tiles down and merges adjacent tiles if possible.
@@ -106,15 +144,17 @@ def move_down(board):
     Returns:
         tuple: The updated board, a boolean indicating if any move was made, and the score increment.
     """
-    rotated_board = np.rot90(board)
-    pushed_board, has_pushed = push_board_right(rotated_board)
-    merged_board, has_merged, score = merge_elements(pushed_board)
-    second_pushed_board, _ = push_board_right(merged_board)
-    rotated_back_board = np.rot90(second_pushed_board, -1)
-    move_made = has_pushed or has_merged
-    return rotated_back_board, move_made, score
+    new = np.empty_like(board)
+    move_made = False
+    score = 0
+    # Columns read top to bottom turn a down move into a right move
+    for col in range(CELL_COUNT):
+        line_moved, line_score = slide_merge_row_right(board[:, col], new[:, col])
+        move_made = move_made or line_moved
+        score += line_score
+    return new, move_made, score
 
-@njit
+@njit("Tuple((int32[:, :], boolean, int64))(int32[:, :])", cache=True, nogil=True)
 def move_left(board):
     """
     Moves all tiles left and merges adjacent tiles if possible.
@@ -123,49 +163,253 @@ def move_left(board):
     Returns:
         tuple: The updated board, a boolean indicating if any move was made, and the score increment.
     """
-    rotated_board = np.rot90(board, 2)
-    pushed_board, has_pushed = push_board_right(rotated_board)
-    merged_board, has_merged, score = merge_elements(pushed_board)
-    second_pushed_board, _ = push_board_right(merged_board)
-    rotated_back_board = np.rot90(second_pushed_board, -2)
-    move_made = has_pushed or has_merged
-    return rotated_back_board, move_made, score
+    new = np.empty_like(board)
+    move_made = False
+    score = 0
+    # Rows read right to left turn a left move into a right move
+    for row in range(CELL_COUNT):
+        line_moved, line_score = slide_merge_row_right(board[row, ::-1], new[row, ::-1])
+        move_made = move_made or line_moved
+        score += line_score
+    return new, move_made, score
 
-@njit
-def move_right(board):
+@njit("boolean(int32[:, :])", cache=True, nogil=True)
+def check_game_over(board):
     """
-    Moves all tiles right and merges adjacent tiles if possible.
+    Checks if no valid moves are possible.
     Parameters:
         board (numpy.ndarray): The current game board.
     Returns:
-        tuple: The updated board, a boolean indicating if any move was made, and the score increment.
+        bool: True if no moves are possible, False otherwise.
     """
-    pushed_board, has_pushed = push_board_right(board)
-    merged_board, has_merged, score = merge_elements(pushed_board)
-    second_pushed_board, _ = push_board_right(merged_board)
-    move_made = has_pushed or has_merged
-    return second_pushed_board, move_made, score
+    # A move exists as long as there is an empty cell or two equal neighbouring tiles
+    for row in range(CELL_COUNT):
+        for col in range(CELL_COUNT):
+            if board[row][col] == 0:
+                return False
+    for i in range(CELL_COUNT):
+        for j in range(CELL_COUNT - 1):
+            if board[i][j] == board[i][j + 1] or board[j][i] == board[j + 1][i]:
+                return False
+    return True  # No moves possible
 
-@njit
-def check_game_over(board):
+def reverse_row(row):
     """
-    Checks if no valid moves are possible.
+    Reverses the order of the four nibbles in a 16-bit row.
+    Parameters:
+        row (int): The row to reverse.
+    Returns:
+        int: The reversed row.
+    """
+    return ((row >> 12) & 0xF) | ((row >> 4) & 0xF0) | ((row << 4) & 0xF00) | ((row << 12) & 0xF000)
+
+def build_row_tables():
+    """
+    Precomputes the result and score of moving every possible row, so a bitboard move becomes four lookups.
+    Returns:
+        tuple: The rows after a left move, the rows after a right move, and the score increment of each row.
+    """
+    move_left_row = np.zeros(ROW_COUNT, dtype=np.uint16)
+    move_right_row = np.zeros(ROW_COUNT, dtype=np.uint16)
+    score_row = np.zeros(ROW_COUNT, dtype=np.uint32)
+    for row in range(ROW_COUNT):
+        tiles = [(row >> (4 * col)) & 0xF for col in range(CELL_COUNT)]
+        tiles = [tile for tile in tiles if tile]
+        merged = []
+        score = 0
+        i = 0
+        while i < len(tiles):
+            # A nibble cannot hold anything above 2^15, so those tiles never merge
+            if i + 1 < len(tiles) and tiles[i] == tiles[i + 1] and tiles[i] != 0xF:
+                merged.append(tiles[i] + 1)
+                score += 1 << (tiles[i] + 1)
+                i += 2
+            else:
+                merged.append(tiles[i])
+                i += 1
+        result = 0
+        for col, tile in enumerate(merged):
+            result |= tile << (4 * col)
+        move_left_row[row] = result
+        move_right_row[reverse_row(row)] = reverse_row(result)
+        score_row[row] = score
+    return move_left_row, move_right_row, score_row
+
+MOVE_LEFT_ROW, MOVE_RIGHT_ROW, SCORE_ROW = build_row_tables()
+
+@njit("uint64(int32[:, :])", cache=True, nogil=True)
+def board_to_bitboard(board):
+    """
+    Packs a game board into a bitboard.
     Parameters:
         board (numpy.ndarray): The current game board.
+    Returns:
+        numpy.uint64: The bitboard holding log2 of every tile.
+    """
+    bitboard = np.uint64(0)
+    for row in range(CELL_COUNT):
+        for col in range(CELL_COUNT):
+            value = board[row][col]
+            exponent = 0
+            while value > 1:
+                value >>= 1
+                exponent += 1
+            bitboard |= np.uint64(exponent) << np.uint64(4 * (row * CELL_COUNT + col))
+    return bitboard
+
+@njit("int32[:, :](uint64)", cache=True, nogil=True)
+def bitboard_to_board(bitboard):
+    """
+    Unpacks a bitboard into a game board.
+    Parameters:
+        bitboard (numpy.uint64): The bitboard to unpack.
+    Returns:
+        numpy.ndarray: The game board with the actual tile values.
+    """
+    board = np.zeros((CELL_COUNT, CELL_COUNT), dtype=np.int32)
+    for row in range(CELL_COUNT):
+        for col in range(CELL_COUNT):
+            exponent = (bitboard >> np.uint64(4 * (row * CELL_COUNT + col))) & NIBBLE_MASK
+            if exponent:
+                board[row][col] = 1 << exponent
+    return board
+
+@njit("uint64(uint64)", cache=True, nogil=True)
+def transpose_bitboard(bitboard):
+    """
+    Transposes a bitboard so columns become rows.
+    Parameters:
+        bitboard (numpy.uint64): The bitboard to transpose.
+    Returns:
+        numpy.uint64: The transposed bitboard.
+    """
+    a1 = bitboard & np.uint64(0xF0F00F0FF0F00F0F)
+    a2 = bitboard & np.uint64(0x0000F0F00000F0F0)
+    a3 = bitboard & np.uint64(0x0F0F00000F0F0000)
+    a = a1 | (a2 << np.uint64(12)) | (a3 >> np.uint64(12))
+    b1 = a & np.uint64(0xFF00FF0000FF00FF)
+    b2 = a & np.uint64(0x00FF00FF00000000)
+    b3 = a & np.uint64(0x00000000FF00FF00)
+    return b1 | (b2 >> np.uint64(24)) | (b3 << np.uint64(24))
+
+@njit("Tuple((uint64, int64))(uint64)", cache=True, nogil=True)
+def move_left_bitboard(bitboard):
+    """
+    Moves all tiles of a bitboard left and merges adjacent tiles if possible.
+    Parameters:
+        bitboard (numpy.uint64): The current bitboard.
+    Returns:
+        tuple: The updated bitboard and the score increment.
+    """
+    new = np.uint64(0)
+    score = 0
+    for row in range(CELL_COUNT):
+        shift = np.uint64(16 * row)
+        line = (bitboard >> shift) & ROW_MASK
+        new |= np.uint64(MOVE_LEFT_ROW[line]) << shift
+        score += SCORE_ROW[line]
+    return new, score
+
+@njit("Tuple((uint64, int64))(uint64)", cache=True, nogil=True)
+def move_right_bitboard(bitboard):
+    """
+    Moves all tiles of a bitboard right and merges adjacent tiles if possible.
+    Parameters:
+        bitboard (numpy.uint64): The current bitboard.
+    Returns:
+        tuple: The updated bitboard and the score increment.
+    """
+    new = np.uint64(0)
+    score = 0
+    for row in range(CELL_COUNT):
+        shift = np.uint64(16 * row)
+        line = (bitboard >> shift) & ROW_MASK
+        new |= np.uint64(MOVE_RIGHT_ROW[line]) << shift
+        score += SCORE_ROW[line]
+    return new, score
+
+@njit("Tuple((uint64, int64))(uint64)", cache=True, nogil=True)
+def move_up_bitboard(bitboard):
+    """
+    Moves all tiles of a bitboard up and merges adjacent tiles if possible.
+    Parameters:
+        bitboard (numpy.uint64): The current bitboard.
+    Returns:
+        tuple: The updated bitboard and the score increment.
+    """
+    new, score = move_left_bitboard(transpose_bitboard(bitboard))
+    return transpose_bitboard(new), score
+
+@njit("Tuple((uint64, int64))(uint64)", cache=True, nogil=True)
+def move_down_bitboard(bitboard):
+    """
+    Moves all tiles of a bitboard down and merges adjacent tiles if possible.
+    Parameters:
+        bitboard (numpy.uint64): The current bitboard.
+    Returns:
+        tuple: The updated bitboard and the score increment.
+    """
+    new, score = move_right_bitboard(transpose_bitboard(bitboard))
+    return transpose_bitboard(new), score
+
+@njit("Tuple((uint64, int64))(uint64, int64)", cache=True, nogil=True)
+def execute_move_bitboard(bitboard, direction):
+    """
+    Moves all tiles of a bitboard in the given direction.
+    Parameters:
+        bitboard (numpy.uint64): The current bitboard.
+        direction (int): 0 for up, 1 for down, 2 for left, 3 for right.
+    Returns:
+        tuple: The updated bitboard and the score increment.
+    """
+    if direction == 0:
+        return move_up_bitboard(bitboard)
+    if direction == 1:
+        return move_down_bitboard(bitboard)
+    if direction == 2:
+        return move_left_bitboard(bitboard)
+    return move_right_bitboard(bitboard)
+
+@njit("uint64(uint64)", cache=True, nogil=True)
+def nonzero_nibble_mask(bitboard):
+    """
+    Marks every nonzero nibble of a bitboard.
+    Parameters:
+        bitboard (numpy.uint64): The bitboard to scan.
+    Returns:
+        numpy.uint64: A mask with the lowest bit of each nonzero nibble set.
+    """
+    folded = bitboard | (bitboard >> np.uint64(1)) | (bitboard >> np.uint64(2)) | (bitboard >> np.uint64(3))
+    return folded & NIBBLE_LOW_BITS
+
+@njit("uint64(uint64)", cache=True, nogil=True)
+def empty_nibble_mask(bitboard):
+    """
+    Marks every empty cell of a bitboard.
+    Parameters:
+        bitboard (numpy.uint64): The bitboard to scan.
+    Returns:
+        numpy.uint64: A mask with the lowest bit of each empty nibble set.
+    """
+    return nonzero_nibble_mask(bitboard) ^ NIBBLE_LOW_BITS
+
+@njit("boolean(uint64)", cache=True, nogil=True)
+def check_game_over_bitboard(bitboard):
+    """
+    Checks if no valid moves are possible on a bitboard.
+    Parameters:
+        bitboard (numpy.uint64): The current bitboard.
     Returns:
         bool: True if no moves are possible, False otherwise.
     """
-    # Test all moves
-    _, move_made, _ = move_up(board)
-    if move_made:
-        return False
-    _, move_made, _ = move_down(board)
-    if move_made:
+    # Any empty cell leaves a move
+    if nonzero_nibble_mask(bitboard) != NIBBLE_LOW_BITS:
         return False
-    _, move_made, _ = move_left(board)
-    if move_made:
+    # XOR with the right and lower neighbour gives a zero nibble wherever two tiles are equal
+    horizontal = nonzero_nibble_mask(bitboard ^ (bitboard >> np.uint64(4)))
+    if horizontal & HORIZONTAL_PAIR_BITS != HORIZONTAL_PAIR_BITS:
         return False
-    _, move_made, _ = move_right(board)
-    if move_made:
+    vertical = nonzero_nibble_mask(bitboard ^ (bitboard >> np.uint64(16)))
+    if vertical & VERTICAL_PAIR_BITS != VERTICAL_PAIR_BITS:
         return False
-    return True  # No moves possible
\ No newline at end of file
+    return True  # No moves possible
@@ -22,7 +22,7 @@ def play_single_game(ai_move_func):
     moves_until_2048_found = None
 
     while True:
-        new_board, move_made, score_increment = ai_move_func(board.copy())
+        new_board, move_made, score_increment = ai_move_func(board)
 
         if not move_made:
             print("No move made. Game Over.")